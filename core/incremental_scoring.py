@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from scoring_engine import (
+    load_data,
+    calculate_metrics,
+    format_report_section,
+    REPORT_HEADER
+)
+from outcome_table import apply_outcomes, ruleset_version
+
+
+def row_hashes(df):
+    """
+    Content hash of every input row (stable across runs)
+    """
+
+    return [
+        format(value, "016x")
+        for value in pd.util.hash_pandas_object(df, index=False)
+    ]
+
+
+def manifest_path_for(report_path):
+    return report_path + ".manifest.json"
+
+
+def forget_manifest(report_path):
+    """
+    Call after the report was rewritten without a manifest
+    (a full run), so the next incremental run starts over
+    """
+    manifest_path = manifest_path_for(report_path)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+def report_digest(report_path):
+    if not os.path.exists(report_path):
+        return None
+    with open(report_path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as file:
+        return json.load(file)
+
+
+def save_manifest(manifest_path, manifest):
+    # Write then rename, so an interrupted run never leaves half a manifest
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file)
+    os.replace(temp_path, manifest_path)
+
+
+def run_incremental(file_path, report_path, manifest_path=None):
+    """
+    Rescores only new or changed rows and patches the text report.
+
+    The manifest stores the ruleset version, the hash of every input
+    row, the report section of every hash and a digest of the report
+    it wrote. When the rules changed, the manifest is ignored and
+    everything is rescored; when the report was rewritten by anyone
+    else, it is rewritten instead of appended to.
+    """
+
+    manifest_path = manifest_path or manifest_path_for(report_path)
+    manifest = load_manifest(manifest_path)
+    ruleset = ruleset_version()
+
+    if manifest is None or manifest["ruleset"] != ruleset:
+        manifest = {"ruleset": ruleset, "rows": [], "sections": {}}
+
+    df = load_data(file_path)
+    hashes = row_hashes(df)
+    sections = manifest["sections"]
+
+    # Score only rows whose content was never seen
+    changed = [i for i, h in enumerate(hashes) if h not in sections]
+    if changed:
+        scored = apply_outcomes(calculate_metrics(df.iloc[changed].copy()))
+        for i, (_, row) in zip(changed, scored.iterrows()):
+            sections[hashes[i]] = format_report_section(row)
+
+    previous = manifest["rows"]
+    # Only append to the exact report this manifest describes
+    appending = (
+        previous
+        and hashes[:len(previous)] == previous
+        and report_digest(report_path) == manifest.get("report")
+    )
+
+    if appending:
+        # Old rows untouched: only new rows go to the end of the report
+        with open(report_path, "a") as file:
+            for h in hashes[len(previous):]:
+                file.write(sections[h])
+    else:
+        with open(report_path, "w") as file:
+            file.write(REPORT_HEADER)
+            for h in hashes:
+                file.write(sections[h])
+
+    # Forget sections of rows that no longer exist
+    manifest["sections"] = {h: sections[h] for h in hashes}
+    manifest["rows"] = hashes
+    manifest["report"] = report_digest(report_path)
+    save_manifest(manifest_path, manifest)
+
+    print(f"Rescored {len(changed)} of {len(hashes)} rows.")
+    return len(changed)
@@ -0,0 +1,209 @@
+import hashlib
+
+import numpy as np
+
+import scoring_engine
+import insight_generator
+from scoring_engine import (
+    calculate_readiness_score,
+    calculate_score_breakdown,
+    classify_readiness,
+    generate_user_report,
+    determine_financial_profile,
+    generate_risk_flags
+)
+from insight_generator import generate_insights, detect_resistance
+
+
+# ===============================
+# State space
+# ===============================
+# Every rule in the engine only compares a metric against a fixed
+# boundary, so each row falls into one of a small number of states.
+# The representative values below sit strictly inside each bucket.
+
+# sr <= 0 | 0 < sr < 5 | 5 <= sr < 10 | 10 <= sr < 20 | sr >= 20
+SAVINGS_RATE_POINTS = [0, 2.5, 7.5, 15, 25]
+
+# er <= 60 | 60-80 | 80-85 | 85-90 | 90-95 | er > 95  (upper bounds inclusive)
+EXPENSE_RATIO_POINTS = [50, 70, 82.5, 87.5, 92.5, 100]
+
+# gap <= 0 | gap <= 50% of plan | gap > 50% of plan  (as (gap, intended))
+SAVINGS_GAP_POINTS = [(0, 10), (1, 10), (10, 10)]
+
+# "yes" | "no" | anything else
+EMERGENCY_POINTS = ["Yes", "No", ""]
+
+# intended > 0 and actual <= 0 (savings execution failing)
+EXECUTION_FAILING_POINTS = [False, True]
+
+STATE_SHAPE = (
+    len(SAVINGS_RATE_POINTS),
+    len(EXPENSE_RATIO_POINTS),
+    len(SAVINGS_GAP_POINTS),
+    len(EMERGENCY_POINTS),
+    len(EXECUTION_FAILING_POINTS)
+)
+
+
+def _representative_row(sr, er, gap, ef, failing):
+    gap_value, intended = SAVINGS_GAP_POINTS[gap]
+    return {
+        "savings_rate": SAVINGS_RATE_POINTS[sr],
+        "expense_ratio": EXPENSE_RATIO_POINTS[er],
+        "savings_gap": gap_value,
+        "intended_savings": intended,
+        "actual_savings": 0 if EXECUTION_FAILING_POINTS[failing] else 1,
+        "emergency_fund": EMERGENCY_POINTS[ef]
+    }
+
+
+def evaluate_outcome(row):
+    """
+    Runs every rule of the engine on a single row and returns
+    the full outcome as a dict
+    """
+
+    outcome = {}
+    outcome["readiness_score"] = calculate_readiness_score(row)
+    outcome["readiness_level"] = classify_readiness(outcome["readiness_score"])
+    outcome["score_breakdown"] = calculate_score_breakdown(row)
+    outcome["insights"] = generate_insights(row)
+    outcome["resistance_reason"] = detect_resistance(row)
+    outcome["financial_profile"] = determine_financial_profile(row)
+    outcome["risk_flags"] = generate_risk_flags(row)
+    outcome["user_report"] = generate_user_report(outcome)
+    return outcome
+
+
+def build_outcome_table():
+    """
+    Enumerates the finite state space once and evaluates the rules
+    on a representative row of every state.
+
+    The table is derived from the rule functions themselves, so any
+    change to the rules is picked up on the next import.
+    """
+
+    table = []
+    for state in np.ndindex(*STATE_SHAPE):
+        table.append(evaluate_outcome(_representative_row(*state)))
+    return table
+
+
+def ruleset_version():
+    """
+    Fingerprint of the rule sources; changes whenever any rule
+    (or this table) is edited
+    """
+
+    digest = hashlib.sha1()
+    for path in (scoring_engine.__file__, insight_generator.__file__, __file__):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+OUTCOME_TABLE = build_outcome_table()
+SCORE_BY_STATE = np.array(
+    [outcome["readiness_score"] for outcome in OUTCOME_TABLE], dtype=np.int16
+)
+
+
+# ===============================
+# Bucketizing
+# ===============================
+def bucketize(savings_rate, expense_ratio, savings_gap,
+              intended_savings, actual_savings, emergency_fund):
+    """
+    Maps metric arrays to state indices into OUTCOME_TABLE.
+
+    Works element-wise on NumPy arrays (or scalars). The emergency fund
+    can be given as "Yes"/"No" strings or as a boolean array. Rows with a
+    non-finite metric get -1 and must be evaluated with the rules directly.
+    """
+
+    sr = np.asarray(savings_rate, dtype=float)
+    er = np.asarray(expense_ratio, dtype=float)
+    gap = np.asarray(savings_gap, dtype=float)
+    intended = np.asarray(intended_savings, dtype=float)
+    actual = np.asarray(actual_savings, dtype=float)
+    ef = np.asarray(emergency_fund)
+
+    sr_bucket = np.select(
+        [sr <= 0, sr < 5, sr < 10, sr < 20], [0, 1, 2, 3], default=4
+    )
+    er_bucket = np.select(
+        [er <= 60, er <= 80, er <= 85, er <= 90, er <= 95],
+        [0, 1, 2, 3, 4],
+        default=5
+    )
+    gap_bucket = np.select(
+        [gap <= 0, gap <= intended * 0.5], [0, 1], default=2
+    )
+    if ef.dtype == bool:
+        # Already resolved to available / not available
+        ef_bucket = np.where(ef, 0, 1)
+    else:
+        ef = np.char.lower(ef.astype(str))
+        ef_bucket = np.select([ef == "yes", ef == "no"], [0, 1], default=2)
+    failing = ((intended > 0) & (actual <= 0)).astype(int)
+
+    state = np.ravel_multi_index(
+        (sr_bucket, er_bucket, gap_bucket, ef_bucket, failing), STATE_SHAPE
+    )
+
+    finite = (
+        np.isfinite(sr) & np.isfinite(er) & np.isfinite(gap)
+        & np.isfinite(intended) & np.isfinite(actual)
+    )
+    return np.where(finite, state, -1)
+
+
+def lookup_outcome(row):
+    """
+    Returns the precomputed outcome for a single row
+    (falls back to the rules for non-finite metrics)
+    """
+
+    state = int(bucketize(
+        row["savings_rate"],
+        row["expense_ratio"],
+        row["savings_gap"],
+        row["intended_savings"],
+        row["actual_savings"],
+        row["emergency_fund"]
+    ))
+
+    if state < 0:
+        return evaluate_outcome(row)
+    return OUTCOME_TABLE[state]
+
+
+def apply_outcomes(df):
+    """
+    Adds every rule output to a frame that already has metrics:
+    bucketize all rows at once, then index the outcome table.
+
+    The breakdown, insights and risk flags of rows in the same state
+    share one object, so treat them as read-only.
+    """
+
+    states = bucketize(
+        df["savings_rate"].to_numpy(),
+        df["expense_ratio"].to_numpy(),
+        df["savings_gap"].to_numpy(),
+        df["intended_savings"].to_numpy(),
+        df["actual_savings"].to_numpy(),
+        df["emergency_fund"].to_numpy()
+    )
+
+    outcomes = [OUTCOME_TABLE[state] for state in states]
+
+    for position in np.flatnonzero(states < 0):
+        outcomes[position] = evaluate_outcome(df.iloc[position])
+
+    for column in OUTCOME_TABLE[0]:
+        df[column] = [outcome[column] for outcome in outcomes]
+
+    return df
@@ -1,5 +1,4 @@
 import pandas as pd
-from insight_generator import generate_insights, detect_resistance
 
 
 def load_data(file_path):
@@ -176,18 +175,25 @@ def simulate_multiple_reductions(row):
 
 
 
+REPORT_HEADER = "FUTURE READINESS REPORT\n" + "=" * 30 + "\n"
+
+
+def format_report_section(row):
+    lines = [f"\nMonth: {row['month']}\n"]
+    lines.append(f"Readiness Score: {row['readiness_score']} ({row['readiness_level']})\n")
+    lines.append(f"Resistance Reason: {row['resistance_reason']}\n")
+    lines.append("Insights:\n")
+    for insight in row["insights"]:
+        lines.append(f"- {insight}\n")
+    return "".join(lines)
+
+
 def generate_text_report(df, output_path):
     with open(output_path, "w") as file:
-        file.write("FUTURE READINESS REPORT\n")
-        file.write("=" * 30 + "\n")
+        file.write(REPORT_HEADER)
 
         for _, row in df.iterrows():
-            file.write(f"\nMonth: {row['month']}\n")
-            file.write(f"Readiness Score: {row['readiness_score']} ({row['readiness_level']})\n")
-            file.write(f"Resistance Reason: {row['resistance_reason']}\n")
-            file.write("Insights:\n")
-            for insight in row["insights"]:
-                file.write(f"- {insight}\n")
+            file.write(format_report_section(row))
 def determine_financial_profile(row):
     """
     Determines financial personality based on behavior patterns
@@ -234,16 +240,23 @@ def generate_risk_flags(row):
 
 # Run only when executed directly (not when imported)
 if __name__ == "__main__":
+    import sys
+
     file_path = "../data/monthly_finance.csv"
+    report_path = "../reports/future_readiness_report.txt"
+
+    # Only rescore rows that changed since the previous run
+    if "--incremental" in sys.argv:
+        from incremental_scoring import run_incremental
+        run_incremental(file_path, report_path)
+        sys.exit(0)
 
     df = load_data(file_path)
     df = calculate_metrics(df)
 
-    df["readiness_score"] = df.apply(calculate_readiness_score, axis=1)
-    df["readiness_level"] = df["readiness_score"].apply(classify_readiness)
-    df["score_breakdown"] = df.apply(calculate_score_breakdown, axis=1)
-    df["insights"] = df.apply(generate_insights, axis=1)
-    df["resistance_reason"] = df.apply(detect_resistance, axis=1)
+    # Bucketize once, then index the precomputed outcome table
+    from outcome_table import apply_outcomes
+    df = apply_outcomes(df)
 
     print("Future Readiness Analysis:")
     for _, row in df.iterrows():
@@ -255,5 +268,8 @@ if __name__ == "__main__":
         for insight in row["insights"]:
             print("-", insight)
 
-    report_path = "../reports/future_readiness_report.txt"
     generate_text_report(df, report_path)
+
+    # The report no longer matches the incremental manifest
+    from incremental_scoring import forget_manifest
+    forget_manifest(report_path)
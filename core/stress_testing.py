@@ -0,0 +1,162 @@
+import numpy as np
+
+from scoring_engine import classify_readiness, calculate_readiness_score
+from outcome_table import bucketize, SCORE_BY_STATE
+
+LEVELS = ["Strong", "Medium", "Low"]
+
+# Level code (index into LEVELS) for every possible score
+LEVEL_BY_SCORE = np.array(
+    [LEVELS.index(classify_readiness(score)) for score in range(101)],
+    dtype=np.int8
+)
+
+# Emergency fund counts as available while it covers this many months
+EMERGENCY_FUND_MONTHS = 3
+
+
+def simulate_paths(row, paths=10000, months=12,
+                   income_volatility=0.05,
+                   expense_volatility=0.15,
+                   shock_probability=0.03,
+                   shock_severity=0.5,
+                   shock_months=3,
+                   seed=None):
+    """
+    Simulates `paths` future monthly paths for one user.
+
+    - income: lognormal noise, plus shocks that start with
+      `shock_probability` per month and cut income by `shock_severity`
+      for `shock_months` months
+    - variable expenses: mean-preserving lognormal variance
+    - emergency fund: starts at EMERGENCY_FUND_MONTHS of expenses if the
+      user has one (0 otherwise); every month's savings are added to it
+      and every deficit is drawn from it
+
+    Returns (paths x months) arrays of the metrics used by the rules.
+    """
+
+    inputs = [float(row[column]) for column in (
+        "income", "fixed_expenses", "variable_expenses", "intended_savings"
+    )]
+    if not np.all(np.isfinite(inputs)):
+        raise ValueError("Stress testing needs finite inputs.")
+    if float(row["income"]) <= 0:
+        raise ValueError("Stress testing needs a positive income.")
+    if shock_months < 1:
+        raise ValueError("shock_months must be at least 1.")
+
+    rng = np.random.default_rng(seed)
+    shape = (paths, months)
+
+    income = float(row["income"])
+    fixed = float(row["fixed_expenses"])
+    variable = float(row["variable_expenses"])
+    intended = float(row["intended_savings"])
+
+    # Income: noise x shocks (a shock lasts `shock_months` from its onset)
+    income_noise = rng.lognormal(
+        -income_volatility ** 2 / 2, income_volatility, shape
+    )
+    onsets = (rng.random(shape) < shock_probability).cumsum(axis=1)
+    lagged = np.zeros_like(onsets)
+    lagged[:, shock_months:] = onsets[:, :-shock_months]
+    shocked = (onsets - lagged) > 0
+    monthly_income = income * income_noise * np.where(shocked, 1 - shock_severity, 1)
+
+    monthly_variable = variable * rng.lognormal(
+        -expense_volatility ** 2 / 2, expense_volatility, shape
+    )
+    total_expenses = fixed + monthly_variable
+    actual_savings = monthly_income - total_expenses
+
+    # Emergency fund: running balance, available while it covers the target
+    target = EMERGENCY_FUND_MONTHS * (fixed + variable)
+    start = target if str(row["emergency_fund"]).lower() == "yes" else 0.0
+    balance = start + actual_savings.cumsum(axis=1)
+
+    # A full income shock (severity 1) leaves months with no income;
+    # their ratios are left non-finite and scored by score_paths
+    with np.errstate(divide="ignore", invalid="ignore"):
+        savings_rate = actual_savings / monthly_income * 100
+        expense_ratio = total_expenses / monthly_income * 100
+
+    return {
+        "savings_rate": savings_rate,
+        "expense_ratio": expense_ratio,
+        "savings_gap": intended - actual_savings,
+        "intended_savings": np.full(shape, intended),
+        "actual_savings": actual_savings,
+        "emergency_fund": balance >= target
+    }
+
+
+def score_paths(metrics):
+    """
+    Scores every month of every path with the existing rules
+    (through the precomputed outcome table; cells outside the table,
+    e.g. a month with no income after a full shock, run the rules directly)
+    """
+
+    states = bucketize(
+        metrics["savings_rate"],
+        metrics["expense_ratio"],
+        metrics["savings_gap"],
+        metrics["intended_savings"],
+        metrics["actual_savings"],
+        metrics["emergency_fund"]
+    )
+    scores = SCORE_BY_STATE[np.maximum(states, 0)]
+
+    for cell in zip(*np.nonzero(states < 0)):
+        row = {name: values[cell] for name, values in metrics.items()}
+        row["emergency_fund"] = "Yes" if row["emergency_fund"] else "No"
+        scores[cell] = calculate_readiness_score(row)
+    return scores
+
+
+def stress_test(row, paths=10000, months=12, seed=None, **shocks):
+    """
+    Probability of each readiness level in each of the next `months`
+    months, estimated from `paths` simulated paths
+    """
+
+    metrics = simulate_paths(row, paths=paths, months=months, seed=seed, **shocks)
+    scores = score_paths(metrics)
+    levels = LEVEL_BY_SCORE[scores]
+
+    # counts[level, month]
+    counts = np.stack([(levels == code).sum(axis=0) for code in range(len(LEVELS))])
+    probabilities = counts / paths
+
+    return {
+        "paths": paths,
+        "months": months,
+        "level_probabilities": {
+            level: probabilities[code].round(4).tolist()
+            for code, level in enumerate(LEVELS)
+        },
+        "mean_score": scores.mean(axis=0).round(1).tolist()
+    }
+
+
+def stress_test_portfolio(df, client_column="client_id", paths=10000,
+                          months=12, seed=None, **shocks):
+    """
+    Runs the stress test on the latest row of every client
+    (meant for overnight batch runs)
+    """
+
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    for client, group in df.groupby(client_column, sort=False):
+        results[client] = stress_test(
+            group.iloc[-1],
+            paths=paths,
+            months=months,
+            seed=rng.integers(2 ** 32),
+            **shocks
+        )
+
+    return results
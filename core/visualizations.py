@@ -1,20 +1,91 @@
 import matplotlib
 matplotlib.use("Agg")   # ✅ IMPORTANT: non-GUI backend
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import hashlib
 import os
 
+# Hex digits of the content hash in generated chart names
+PLOT_DIGEST_LENGTH = 12
+
+# Where the web app serves generated charts from (static/plots),
+# independent of the working directory
+WEB_PLOTS_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "web", "static", "plots")
+)
+
+
+def savings_annotations(savings, expenses, income, emergency_fund):
+    """
+    Behavioral notes shown on the savings vs expenses chart
+    """
+
+    annotations = []
+
+    savings_rate = (savings / income) * 100 if income > 0 else 0
+    expense_ratio = (expenses / income) * 100 if income > 0 else 0
+
+    if savings_rate < 10:
+        annotations.append("Low savings rate")
+    if expense_ratio > 80:
+        annotations.append("High expense pressure")
+    if str(emergency_fund).lower() == "no":
+        annotations.append("No emergency fund")
+
+    return annotations
+
+
+def trend_note(delta):
+    """
+    Note and color for the last change of the readiness trend
+    """
+
+    if delta > 0:
+        return "Improved due to better control", "green"
+    elif delta < 0:
+        return "Decline due to spending pressure", "red"
+    return "Stable behavior", "gray"
+
+
+def save_fingerprinted(directory, name):
+    """
+    Saves the current figure as <name>.<content hash>.png and returns
+    the file name. New content always gets a new name, so browsers can
+    cache every chart forever.
+    """
+
+    buffer = BytesIO()
+    plt.savefig(buffer, format="png")
+    data = buffer.getvalue()
+
+    digest = hashlib.sha1(data).hexdigest()[:PLOT_DIGEST_LENGTH]
+    filename = f"{name}.{digest}.png"
+    path = os.path.join(directory, filename)
+
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    else:
+        # Still in use: keep it out of the old-chart cleanup
+        os.utime(path)
+    return filename
+
 
 def save_web_plots(df):
     """
     Generates plots for the web app and saves them as images
-    with behavioral annotations
+    with behavioral annotations.
+    Returns the chart paths relative to the static folder.
     """
 
-    output_dir = "../web/static/plots"
-    os.makedirs(output_dir, exist_ok=True)
-
     # ===============================
     # 1️⃣ Savings vs Expenses (Annotated)
     # ===============================
@@ -28,17 +99,9 @@ def save_web_plots(df):
     plt.ylabel("Amount")
 
     # 🔍 Behavioral annotations
-    annotations = []
-
-    savings_rate = (savings / income) * 100 if income > 0 else 0
-    expense_ratio = (expenses / income) * 100 if income > 0 else 0
-
-    if savings_rate < 10:
-        annotations.append("Low savings rate")
-    if expense_ratio > 80:
-        annotations.append("High expense pressure")
-    if str(df.iloc[0]["emergency_fund"]).lower() == "no":
-        annotations.append("No emergency fund")
+    annotations = savings_annotations(
+        savings, expenses, income, df.iloc[0]["emergency_fund"]
+    )
 
     if annotations:
         plt.text(
@@ -51,7 +114,7 @@ def save_web_plots(df):
         )
 
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "savings_vs_expenses.png"))
+    savings_plot = save_fingerprinted(WEB_PLOTS_DIR, "savings_vs_expenses")
     plt.close()
 
     # ===============================
@@ -79,13 +142,20 @@ def save_web_plots(df):
         )
 
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "expense_split.png"))
+    split_plot = save_fingerprinted(WEB_PLOTS_DIR, "expense_split")
     plt.close()
 
+    return {
+        "savings_vs_expenses": "plots/" + savings_plot,
+        "expense_split": "plots/" + split_plot
+    }
+
 
 def save_dashboard_trend(records):
     """
     Saves a mini trend graph for the dashboard with annotations
+    and returns its path relative to the static folder
+    (None when there are fewer than two points)
     """
 
     import matplotlib
@@ -96,7 +166,7 @@ def save_dashboard_trend(records):
     scores = [r[1] for r in records][:6][::-1]
 
     if len(scores) < 2:
-        return
+        return None
 
     plt.figure(figsize=(4, 2))
     plt.plot(months, scores, marker="o")
@@ -104,17 +174,7 @@ def save_dashboard_trend(records):
     plt.xticks(rotation=45)
 
     # 🔍 Annotate last change
-    delta = scores[-1] - scores[-2]
-
-    if delta > 0:
-        note = "Improved due to better control"
-        color = "green"
-    elif delta < 0:
-        note = "Decline due to spending pressure"
-        color = "red"
-    else:
-        note = "Stable behavior"
-        color = "gray"
+    note, color = trend_note(scores[-1] - scores[-2])
 
     plt.annotate(
         note,
@@ -127,6 +187,217 @@ def save_dashboard_trend(records):
     )
 
     plt.tight_layout()
-    path = os.path.join("static", "plots", "dashboard_trend.png")
-    plt.savefig(path)
-    plt.close()
\ No newline at end of file
+    trend_plot = save_fingerprinted(WEB_PLOTS_DIR, "dashboard_trend")
+    plt.close()
+    return "plots/" + trend_plot
+
+# ===============================
+# Batch rendering for portfolios
+# ===============================
+class ChartCanvas:
+    """
+    Preallocated figures for one worker. Each client only updates
+    the data of existing artists, so no figure is rebuilt per chart.
+    """
+
+    TREND_POINTS = 6
+
+    def __init__(self):
+        # Savings vs Expenses
+        self.bar_fig = Figure(figsize=(5, 4))
+        self.bar_ax = self.bar_fig.add_subplot()
+        self.bars = self.bar_ax.bar([0, 1], [0, 0])
+        self.bar_ax.set_xticks([0, 1], ["Savings", "Expenses"])
+        self.bar_ax.set_title("Savings vs Expenses")
+        self.bar_ax.set_ylabel("Amount")
+        self.bar_note = self.bar_ax.text(
+            0.5, 0, "", ha="center", fontsize=9, color="darkred"
+        )
+
+        # Expense Split
+        self.pie_fig = Figure(figsize=(5, 4))
+        self.pie_ax = self.pie_fig.add_subplot()
+        self.wedges, self.pie_labels, self.pie_pcts = self.pie_ax.pie(
+            [1, 1],
+            labels=["Fixed Expenses", "Variable Expenses"],
+            autopct="%1.1f%%"
+        )
+        self.pie_ax.set_title("Expense Composition")
+        self.pie_note = self.pie_ax.text(
+            0, -1.3, "Variable expenses dominate spending",
+            ha="center", fontsize=9, color="darkred"
+        )
+
+        # Bar and pie layouts don't depend on the client: lay them out
+        # once (bars at a six-digit scale, so amount ticks always fit)
+        self.bars[0].set_height(100000)
+        self.bar_ax.relim()
+        self.bar_ax.autoscale_view()
+        self.bar_fig.tight_layout()
+        self.pie_fig.tight_layout()
+
+        # Readiness Trend
+        self.trend_fig = Figure(figsize=(4, 2))
+        self.trend_ax = self.trend_fig.add_subplot()
+        (self.trend_line,) = self.trend_ax.plot([], [], marker="o")
+        self.trend_ax.set_title("Readiness Trend")
+        self.trend_note = self.trend_ax.annotate(
+            "", (0, 0),
+            textcoords="offset points",
+            xytext=(0, 8),
+            ha="center",
+            fontsize=8
+        )
+
+    def render_savings(self, latest, path):
+        savings = latest["actual_savings"]
+        expenses = latest["total_expenses"]
+
+        self.bars[0].set_height(savings)
+        self.bars[1].set_height(expenses)
+        self.bar_ax.relim()
+        self.bar_ax.autoscale_view()
+
+        annotations = savings_annotations(
+            savings, expenses, latest["income"], latest["emergency_fund"]
+        )
+        self.bar_note.set_text(" | ".join(annotations))
+        self.bar_note.set_y(max(savings, expenses) * 0.9)
+        self.bar_note.set_visible(bool(annotations))
+
+        self.bar_fig.savefig(path)
+
+    def render_split(self, latest, path):
+        fixed = latest["fixed_expenses"]
+        variable = latest["variable_expenses"]
+        total = fixed + variable
+
+        # Same geometry as Axes.pie with its default start angle and radius
+        theta1 = 0
+        for wedge, label, pct, value in zip(
+            self.wedges, self.pie_labels, self.pie_pcts, [fixed, variable]
+        ):
+            frac = value / total if total > 0 else 0
+            theta2 = theta1 + frac
+            wedge.set_theta1(360 * theta1)
+            wedge.set_theta2(360 * theta2)
+
+            angle = np.pi * (theta1 + theta2)
+            x, y = np.cos(angle), np.sin(angle)
+            label.set_position((1.1 * x, 1.1 * y))
+            label.set_horizontalalignment("left" if 1.1 * x > 0 else "right")
+            pct.set_position((0.6 * x, 0.6 * y))
+            pct.set_text("%1.1f%%" % (100 * frac))
+
+            for artist in (wedge, label, pct):
+                artist.set_visible(frac > 0)
+            theta1 = theta2
+
+        self.pie_note.set_visible(variable > fixed)
+
+        self.pie_fig.savefig(path)
+
+    def render_trend(self, months, scores, path):
+        months = list(months)[-self.TREND_POINTS:]
+        scores = list(scores)[-self.TREND_POINTS:]
+
+        if len(scores) < 2:
+            return False
+
+        positions = list(range(len(scores)))
+        self.trend_line.set_data(positions, scores)
+        self.trend_ax.set_xticks(positions, months, rotation=45)
+        self.trend_ax.relim()
+        self.trend_ax.autoscale_view()
+
+        note, color = trend_note(scores[-1] - scores[-2])
+        self.trend_note.set_text(note)
+        self.trend_note.set_color(color)
+        self.trend_note.xy = (positions[-1], scores[-1])
+
+        # Month tick labels change per client: the only layout per chart
+        self.trend_fig.tight_layout()
+        self.trend_fig.savefig(path)
+        return True
+
+
+_canvas = None
+
+
+def _init_worker():
+    global _canvas
+    _canvas = ChartCanvas()
+
+
+def _render_client(job):
+    client, rows, client_dir = job
+    os.makedirs(client_dir, exist_ok=True)
+
+    latest = rows[-1]
+    written = [
+        os.path.join(client_dir, "savings_vs_expenses.png"),
+        os.path.join(client_dir, "expense_split.png")
+    ]
+    _canvas.render_savings(latest, written[0])
+    _canvas.render_split(latest, written[1])
+
+    trend_path = os.path.join(client_dir, "trend.png")
+    if _canvas.render_trend(
+        [row["month"] for row in rows],
+        [row["readiness_score"] for row in rows],
+        trend_path
+    ):
+        written.append(trend_path)
+
+    return client, written
+
+
+def render_portfolio_plots(df, output_dir, client_column="client_id",
+                           workers=None):
+    """
+    Renders the chart pack of every client in a scored frame.
+
+    Rows of a client are expected in chronological order; the latest
+    row drives the savings and split charts, all rows drive the trend.
+    Charts are written to <output_dir>/<client>/ and a dict of
+    client -> written paths is returned.
+    """
+
+    columns = [
+        "month", "income", "actual_savings", "total_expenses",
+        "fixed_expenses", "variable_expenses", "emergency_fund",
+        "readiness_score"
+    ]
+
+    jobs = [
+        (client, group[columns].to_dict("records"),
+         os.path.join(output_dir, str(client)))
+        for client, group in df.groupby(client_column, sort=False)
+    ]
+
+    if not jobs:
+        return {}
+
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    ) as pool:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        return dict(pool.map(_render_client, jobs, chunksize=chunksize))
+
+
+# Render chart packs for a portfolio CSV (one row per client and month)
+if __name__ == "__main__":
+    import sys
+    from scoring_engine import load_data, calculate_metrics
+    from outcome_table import apply_outcomes
+
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "../data/monthly_finance.csv"
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "../reports/charts"
+
+    df = apply_outcomes(calculate_metrics(load_data(file_path)))
+    if "client_id" not in df:
+        df["client_id"] = "client"
+
+    rendered = render_portfolio_plots(df, output_dir)
+    print(f"Rendered charts for {len(rendered)} clients into {output_dir}")
@@ -1,7 +1,9 @@
-from flask import Flask, render_template, request, session, redirect, Response
+from flask import Flask, render_template, request, session, redirect, Response, make_response, stream_with_context
+from markupsafe import Markup
 import pandas as pd
 import sys
 import os
+import math
 
 # ---------- CORE PATH ----------
 sys.path.append(
@@ -10,21 +12,38 @@ sys.path.append(
 
 from scoring_engine import (
     calculate_metrics,
-    calculate_readiness_score,
-    classify_readiness,
-    calculate_score_breakdown,
-    generate_user_report,
-    simulate_multiple_reductions,
-    determine_financial_profile,
-    generate_risk_flags
+    simulate_multiple_reductions
 )
 
-from insight_generator import generate_insights, detect_resistance
+from outcome_table import apply_outcomes
+from stress_testing import stress_test
 from visualizations import save_web_plots, save_dashboard_trend
-from history_db import get_connection as get_history_connection
+from history_db import (
+    get_connection as get_history_connection,
+    init_history_db,
+    get_history_version,
+    bump_history_version
+)
+from page_cache import page_etag, not_modified, set_page_etag, fragment_cache
+from history_cache import history_cache, MONTH_PATTERN
+from static_assets import init_static_assets
 
 app = Flask(__name__)
 app.secret_key = "financial_readiness_secret"
+init_static_assets(app)
+
+# Fixed seed so the same inputs always show the same outlook
+STRESS_TEST_SEED = 2024
+STRESS_TEST_CHECKPOINTS = [3, 6, 12]
+
+# Users allowed to export every user's history (comma-separated emails)
+EXPORT_ADMINS = {
+    email.strip()
+    for email in os.environ.get("EXPORT_ADMINS", "").split(",")
+    if email.strip()
+}
+
+init_history_db()
 
 
 # ---------- HOME ----------
@@ -54,16 +73,31 @@ def dashboard():
     if "user" not in session:
         return redirect("/login")
 
-    conn = get_history_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT month, readiness_score, financial_profile
-        FROM readiness_history
-        WHERE user_email = ?
-        ORDER BY month DESC
-    """, (session["user"],))
-    records = cursor.fetchall()
-    conn.close()
+    user = session["user"]
+    version = get_history_version(user)
+    etag = page_etag("dashboard", user, version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    summary = fragment_cache.get("dashboard", user, version)
+    if summary is None:
+        summary = render_dashboard_summary(user, version)
+        fragment_cache.put("dashboard", user, version, summary)
+
+    response = make_response(render_template(
+        "dashboard.html",
+        user=user,
+        dashboard_summary=Markup(summary)
+    ))
+    return set_page_etag(response, etag)
+
+
+def render_dashboard_summary(user, version):
+    # (month, score, profile), latest first
+    records = [
+        (r[0], r[1], r[3])
+        for r in reversed(history_cache.records(user, version))
+    ]
 
     assessment_count = len(records)
     last_score = records[0][1] if assessment_count else None
@@ -98,19 +132,20 @@ def dashboard():
             "stable": "Behavior is stable. Small improvements can boost readiness."
         }[trend]
 
+    trend_plot = None
     if assessment_count >= 2:
-        save_dashboard_trend(records)
+        trend_plot = save_dashboard_trend(records)
 
     return render_template(
-        "dashboard.html",
-        user=session["user"],
+        "_dashboard_summary.html",
         last_score=last_score,
         trend=trend,
         trend_message=trend_message,
         next_action=next_action,
         personal_message=personal_message,
         last_profile=last_profile,
-        assessment_count=assessment_count
+        assessment_count=assessment_count,
+        trend_plot=trend_plot
     )
 
 
@@ -120,24 +155,29 @@ def history():
     if "user" not in session:
         return redirect("/login")
 
-    conn = get_history_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT month, readiness_score, readiness_level,
-               financial_profile, key_risk
-        FROM readiness_history
-        WHERE user_email = ?
-        ORDER BY month
-    """, (session["user"],))
-    records = cursor.fetchall()
-    conn.close()
+    user = session["user"]
+    version = get_history_version(user)
+    etag = page_etag("history", user, version)
 
-    return render_template("history.html", records=records)
-from io import BytesIO
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
+    # Pages carrying a one-off flash message must not be revalidated later
+    cacheable = not session.get("_flashes")
+    if cacheable and request.if_none_match.contains(etag):
+        return not_modified(etag)
+
+    table = fragment_cache.get("history", user, version)
+    if table is None:
+        records = history_cache.records(user, version)
+        table = render_template("_history_table.html", records=records)
+        fragment_cache.put("history", user, version, table)
+
+    response = make_response(render_template(
+        "history.html",
+        history_table=Markup(table)
+    ))
+    if cacheable:
+        set_page_etag(response, etag)
+    return response
+from pdf_reports import build_history_pdf, build_evaluation_pdf
 
 
 @app.route("/download_history_pdf", methods=["GET", "POST"])
@@ -145,65 +185,10 @@ def download_history_pdf():
     if "user" not in session:
         return redirect("/login")
 
-    conn = get_history_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT month, readiness_score, readiness_level,
-               financial_profile, key_risk
-        FROM readiness_history
-        WHERE user_email = ?
-        ORDER BY month
-    """, (session["user"],))
-    records = cursor.fetchall()
-    conn.close()
-
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    elements = []
+    user = session["user"]
+    records = history_cache.records(user, get_history_version(user))
 
-    elements.append(Paragraph(
-        "<b>Financial Readiness History Report</b>",
-        styles["Title"]
-    ))
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(
-        f"User: {session['user']}",
-        styles["Normal"]
-    ))
-    elements.append(Spacer(1, 16))
-
-    styles = getSampleStyleSheet()
-    normal = styles["Normal"]
-    table_data = [
-    ["Month", "Score", "Level", "Profile", "Key Risk"]
-]
-
-    for r in records:
-        table_data.append([
-        r[0],  # Month
-        f"{r[1]}/100",
-        r[2],
-        Paragraph(r[3], normal),  # ✅ wrapped Profile
-        Paragraph(r[4], normal)   # ✅ wrapped Key Risk
-    ])
-    table = Table(
-    table_data,
-    colWidths=[70, 60, 60, 160, 180]  # balanced widths
-    )
-    table.setStyle(TableStyle([
-    ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-    ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-    ("FONT", (0,0), (-1,0), "Helvetica-Bold"),
-    ("VALIGN", (0,0), (-1,-1), "TOP"),
-    ("LEFTPADDING", (0,0), (-1,-1), 6),
-    ("RIGHTPADDING", (0,0), (-1,-1), 6),
-]))
-    
-    elements.append(table)
-    doc.build(elements)
-
-    buffer.seek(0)
+    buffer = build_history_pdf(session["user"], records)
     return Response(
         buffer,
         mimetype="application/pdf",
@@ -212,6 +197,63 @@ def download_history_pdf():
         }
     )
 
+
+# ---------- STREAMING EXPORTS ----------
+from history_export import iter_history, stream_rows, MIMETYPES
+
+
+def export_response(user_email, export_format, filename):
+    """
+    Streams history rows page by page; ?from=YYYY-MM&to=YYYY-MM filter
+    the period, ?cursor= resumes after the row that carried that token
+    """
+    if export_format not in MIMETYPES:
+        return "Unknown export format.", 404
+
+    try:
+        rows = iter_history(
+            user_email,
+            start=request.args.get("from"),
+            end=request.args.get("to"),
+            cursor=request.args.get("cursor")
+        )
+        # Fail on a bad cursor before the response starts
+        first = next(rows, None)
+    except ValueError as error:
+        return str(error), 400
+
+    def resumed():
+        if first is not None:
+            yield first
+            yield from rows
+
+    return Response(
+        stream_with_context(stream_rows(resumed(), export_format)),
+        mimetype=MIMETYPES[export_format],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}.{export_format}"
+        }
+    )
+
+
+@app.route("/export/history.<export_format>")
+def export_history(export_format):
+    if "user" not in session:
+        return redirect("/login")
+
+    return export_response(session["user"], export_format, "readiness_history")
+
+
+@app.route("/admin/export/history.<export_format>")
+def export_portfolio(export_format):
+    if "user" not in session:
+        return redirect("/login")
+    if session["user"] not in EXPORT_ADMINS:
+        return "Forbidden", 403
+
+    return export_response(None, export_format, "portfolio_history")
+
+
 # ---------- CLEAR HISTORY ----------
 from flask import flash
 
@@ -220,16 +262,19 @@ def clear_history():
     if "user" not in session:
         return redirect("/login")
 
-    conn = get_history_connection()
+    conn = get_history_connection(session["user"])
     cursor = conn.cursor()
 
     cursor.execute("""
         DELETE FROM readiness_history
         WHERE user_email = ?
     """, (session["user"],))
+    version = bump_history_version(cursor, session["user"])
 
     conn.commit()
     conn.close()
+    fragment_cache.invalidate(session["user"])
+    history_cache.clear(session["user"], version)
 
     # ✅ success message
     flash("History cleared successfully.", "success")
@@ -254,6 +299,12 @@ def analyze():
     # ---------- ❌ VALIDATION ----------
     errors = []
 
+    if not all(math.isfinite(value) for value in (income, fixed, variable, savings)):
+        errors.append("Please enter valid numbers for income, expenses and savings.")
+
+    if not MONTH_PATTERN.match(month):
+        errors.append("Please select a valid month (YYYY-MM).")
+
     if income <= 0:
         errors.append("Monthly income must be greater than zero.")
 
@@ -268,19 +319,12 @@ def analyze():
 
     if errors:
         # 🔁 fetch assessment count safely (FIX for Jinja error)
-        conn = get_history_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM readiness_history
-            WHERE user_email = ?
-        """, (session["user"],))
-        assessment_count = cursor.fetchone()[0]
-        conn.close()
+        assessment_count = history_cache.count(
+            session["user"], get_history_version(session["user"])
+        )
 
-        return render_template(
-            "dashboard.html",
-            user=session["user"],
-            errors=errors,
+        summary = render_template(
+            "_dashboard_summary.html",
             assessment_count=assessment_count,
             last_score=None,
             trend="stable",
@@ -289,6 +333,12 @@ def analyze():
             personal_message="",
             last_profile=None
         )
+        return render_template(
+            "dashboard.html",
+            user=session["user"],
+            errors=errors,
+            dashboard_summary=Markup(summary)
+        )
 
     # ---------- ✅ CONTINUE NORMAL FLOW ----------
     df = pd.DataFrame([{
@@ -302,29 +352,20 @@ def analyze():
     }])
 
     df = calculate_metrics(df)
-    df["readiness_score"] = df.apply(calculate_readiness_score, axis=1)
-    df["readiness_level"] = df["readiness_score"].apply(classify_readiness)
-    df["score_breakdown"] = df.apply(calculate_score_breakdown, axis=1)
-    df["insights"] = df.apply(generate_insights, axis=1)
-    df["resistance_reason"] = df.apply(detect_resistance, axis=1)
+    df = apply_outcomes(df)
 
-    save_web_plots(df)
+    plots = save_web_plots(df)
     result = df.iloc[0]
-    profile = determine_financial_profile(result)
+    profile = result["financial_profile"]
 
     # ---------- 🧠 BEHAVIORAL MEMORY ----------
     behavior_memory = None
-    conn = get_history_connection()
-    cursor = conn.cursor()
+    records = history_cache.records(
+        session["user"], get_history_version(session["user"])
+    )
 
-    cursor.execute("""
-        SELECT readiness_score, key_risk
-        FROM readiness_history
-        WHERE user_email = ?
-        ORDER BY month DESC
-        LIMIT 2
-    """, (session["user"],))
-    history = cursor.fetchall()
+    # (score, key_risk) of the two latest assessments
+    history = [(r[1], r[4]) for r in reversed(records[-2:])]
 
     if len(history) == 2:
         prev_score, prev_risk = history[1]
@@ -338,6 +379,8 @@ def analyze():
             )
 
     # ---------- SAVE HISTORY ----------
+    conn = get_history_connection(session["user"])
+    cursor = conn.cursor()
     cursor.execute("""
         INSERT INTO readiness_history (
             user_email,
@@ -356,9 +399,37 @@ def analyze():
         profile,
         result["resistance_reason"]
     ))
+    version = bump_history_version(cursor, session["user"])
     conn.commit()
     conn.close()
 
+    history_cache.append(
+        session["user"],
+        version,
+        month,
+        int(result["readiness_score"]),
+        result["readiness_level"],
+        profile,
+        result["resistance_reason"]
+    )
+
+    # ---------- 🎲 STRESS TEST ----------
+    stress = stress_test(
+        result,
+        months=max(STRESS_TEST_CHECKPOINTS),
+        seed=STRESS_TEST_SEED
+    )
+    stress_outlook = [
+        {
+            "month": month,
+            "levels": {
+                level: round(probabilities[month - 1] * 100)
+                for level, probabilities in stress["level_probabilities"].items()
+            }
+        }
+        for month in STRESS_TEST_CHECKPOINTS
+    ]
+
     return render_template(
         "result.html",
         score=result["readiness_score"],
@@ -368,9 +439,12 @@ def analyze():
         breakdown=result["score_breakdown"],
         what_if_results=simulate_multiple_reductions(result),
         financial_profile=profile,
-        risk_flags=generate_risk_flags(result),
-        report_text=generate_user_report(result),
-        behavior_memory=behavior_memory
+        risk_flags=result["risk_flags"],
+        report_text=result["user_report"],
+        behavior_memory=behavior_memory,
+        stress_outlook=stress_outlook,
+        stress_paths=stress["paths"],
+        plots=plots
     )
 
 
@@ -380,12 +454,6 @@ def about():
     return render_template("about.html")
 
 # ---------- DOWNLOAD EVALUATION REPORT ----------
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-from io import BytesIO
-
-
 @app.route("/download_report", methods=["POST"])
 def download_report():
     if "user" not in session:
@@ -393,32 +461,7 @@ def download_report():
 
     report_text = request.form.get("report_text", "")
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # Title
-    elements.append(Paragraph(
-        "<b>Financial Readiness Evaluation Report</b>",
-        styles["Title"]
-    ))
-    elements.append(Spacer(1, 12))
-
-    # User
-    elements.append(Paragraph(
-        f"<b>User:</b> {session['user']}",
-        styles["Normal"]
-    ))
-    elements.append(Spacer(1, 12))
-
-    # Body (split text into paragraphs)
-    for line in report_text.split("\n"):
-        elements.append(Paragraph(line, styles["Normal"]))
-        elements.append(Spacer(1, 8))
-
-    doc.build(elements)
-    buffer.seek(0)
+    buffer = build_evaluation_pdf(session["user"], report_text)
 
     return Response(
         buffer,
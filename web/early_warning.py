@@ -0,0 +1,309 @@
+"""
+Portfolio-wide early-warning scan over readiness_history.
+
+    python early_warning.py        # rebuild the alert table, print the top alerts
+
+Every shard is read in sorted keyset pages (user, month, id), each a
+short read of its own, so the scan never blocks the app's writes.
+Deltas, Low streaks and level transitions are computed per page with
+pandas and only one row is carried over to the next page. Shards are
+scanned in parallel and their alerts are written page by page through
+a bounded queue, so memory stays bounded by the batch size whatever
+the size of the table.
+"""
+
+import queue
+import sqlite3
+import threading
+
+import pandas as pd
+
+from history_db import SHARD_PATHS, connect_shard, map_shards
+
+ALERTS_DB = "alerts.db"
+
+BATCH_SIZE = 200_000
+
+# Alert frames waiting to be written (bounds memory with many shards)
+ALERT_QUEUE_SIZE = 4
+
+# A drop of at least this many points since the previous assessment
+DROP_POINTS = 20
+
+# This many consecutive months at "Low"
+LOW_STREAK_MONTHS = 2
+
+LEVEL_RANK = {"Strong": 0, "Medium": 1, "Low": 2}
+
+RESULT_COLUMNS = [
+    "user_email", "month", "period", "score", "previous_score", "score_change",
+    "level", "previous_level", "low_streak"
+]
+
+
+INPUT_COLUMNS = ["user_email", "month", "period", "score", "level"]
+
+# One keyset page of (user, month, id)-sorted rows; "YYYY-MM" -> months
+# since year 0 is computed by SQLite (NULL if unparseable). Rows without
+# a month can't be placed in time and are skipped.
+HISTORY_SCAN_QUERY = """
+    SELECT user_email, month,
+           CASE WHEN month GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]'
+                THEN CAST(substr(month, 1, 4) AS INTEGER) * 12
+                     + CAST(substr(month, 6, 2) AS INTEGER) - 1
+           END,
+           readiness_score, readiness_level, id
+    FROM readiness_history
+    WHERE user_email IS NOT NULL AND month IS NOT NULL
+      AND (user_email, month, id) > (?, ?, ?)
+    ORDER BY user_email, month, id
+    LIMIT ?
+"""
+
+
+def scan_pages(path, batch_size=BATCH_SIZE):
+    """
+    Yields INPUT_COLUMNS rows of one shard, page by page; the
+    connection is closed before every page is handed out
+    """
+
+    key = ("", "", 0)
+    while True:
+        conn = connect_shard(path)
+        rows = conn.execute(HISTORY_SCAN_QUERY, key + (batch_size,)).fetchall()
+        conn.close()
+
+        if not rows:
+            return
+        key = (rows[-1][0], rows[-1][1], rows[-1][-1])
+        yield [row[:-1] for row in rows]
+
+
+def _scan_batch(df, carry_streak):
+    """
+    Computes per-row results for one sorted batch. When the batch starts
+    with the carried row of the previous batch, `carry_streak` is that
+    row's Low streak.
+    """
+
+    new_user = df["user_email"].ne(df["user_email"].shift())
+    previous_score = df["score"].shift().where(~new_user)
+    previous_level = df["level"].shift().where(~new_user)
+
+    period = df["period"].astype(float)
+    low = df["level"].eq("Low")
+    previous_low = low.shift(fill_value=False)
+    gap = (period - period.shift()).where(~new_user)
+
+    # Low streak: number of distinct months inside each run of Low rows
+    # in consecutive months; a resubmission for the same month stays in
+    # the run without counting twice
+    same_month = gap.eq(0)
+    run_start = low & ~(gap.isin([0, 1]) & previous_low)
+    run_id = run_start.cumsum()
+    new_month = low & ~(same_month & previous_low)
+    streak = new_month.astype(int).groupby(run_id).cumsum().where(low, 0)
+    if carry_streak and low.iloc[0]:
+        streak[low & (run_id == run_id.iloc[0])] += carry_streak - 1
+
+    return pd.DataFrame({
+        "user_email": df["user_email"],
+        "month": df["month"],
+        "period": df["period"],
+        "score": df["score"],
+        "previous_score": previous_score,
+        "score_change": df["score"] - previous_score,
+        "level": df["level"],
+        "previous_level": previous_level,
+        "low_streak": streak
+    })
+
+
+def latest_per_user(batches):
+    """
+    Yields frames with the latest result of every user, batch by batch.
+    The batches must hold INPUT_COLUMNS rows sorted by user and month
+    across batches (see scan_pages).
+    """
+
+    carry = None
+    for rows in batches:
+        if not rows:
+            continue
+
+        df = pd.DataFrame(rows, columns=INPUT_COLUMNS)
+        carry_streak = 0
+        if carry is not None:
+            df = pd.concat([carry[INPUT_COLUMNS], df], ignore_index=True)
+            carry_streak = int(carry["low_streak"].iloc[0])
+
+        results = _scan_batch(df, carry_streak)
+        if carry is not None:
+            # The carried row already has its own results
+            results.iloc[0] = carry.iloc[0][RESULT_COLUMNS]
+
+        # Users whose last row is inside this batch are final;
+        # the batch's last row may continue in the next batch
+        is_last = results["user_email"].ne(results["user_email"].shift(-1))
+        is_last.iloc[-1] = False
+        yield results[is_last]
+        carry = results.iloc[[-1]].reset_index(drop=True)
+
+    if carry is not None:
+        yield carry
+
+
+def flag_alerts(latest):
+    """
+    Keeps users with a sharp drop, a Low streak or a downgrade
+    and gives each a severity used for ranking
+    """
+
+    rank = latest["level"].map(LEVEL_RANK)
+    previous_rank = latest["previous_level"].map(LEVEL_RANK)
+
+    drop = latest["score_change"] <= -DROP_POINTS
+    streak = latest["low_streak"] >= LOW_STREAK_MONTHS
+    downgrade = rank > previous_rank
+
+    alerts = latest[drop | streak | downgrade].copy()
+    if alerts.empty:
+        return alerts
+
+    reason = (
+        drop.map({True: "Sharp readiness drop; ", False: ""})
+        + streak.map({True: "Consecutive months at Low; ", False: ""})
+        + downgrade.map({True: "Readiness level downgraded; ", False: ""})
+    )
+    alerts["reason"] = reason[alerts.index].str.rstrip("; ")
+    alerts["transition"] = (
+        alerts["previous_level"].fillna("-") + " -> " + alerts["level"]
+    )
+    alerts["severity"] = (
+        (-alerts["score_change"]).clip(lower=0).fillna(0)
+        + 10 * alerts["low_streak"].where(streak, 0)
+        + 15 * (rank - previous_rank).clip(lower=0).fillna(0)
+    )
+    return alerts
+
+
+def init_alerts_db(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS readiness_alerts (
+            rank INTEGER,
+            user_email TEXT PRIMARY KEY,
+            month TEXT,
+            score INTEGER,
+            previous_score INTEGER,
+            score_change INTEGER,
+            transition TEXT,
+            low_streak INTEGER,
+            reason TEXT,
+            severity REAL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_alerts_rank
+        ON readiness_alerts (rank)
+    """)
+
+
+def scan_shard(path, alerts_queue, batch_size=BATCH_SIZE):
+    """
+    Puts the alerts of one shard on `alerts_queue`, page by page,
+    then None when the shard is done
+    """
+
+    try:
+        for latest in latest_per_user(scan_pages(path, batch_size)):
+            alerts = flag_alerts(latest)
+            if not alerts.empty:
+                alerts_queue.put(alerts)
+    finally:
+        alerts_queue.put(None)
+
+
+def _insert_alerts(out, alerts):
+    out.executemany("""
+        INSERT INTO readiness_alerts (
+            user_email, month, score, previous_score, score_change,
+            transition, low_streak, reason, severity
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            row.user_email, row.month, int(row.score),
+            None if pd.isna(row.previous_score) else int(row.previous_score),
+            None if pd.isna(row.score_change) else int(row.score_change),
+            row.transition, int(row.low_streak), row.reason,
+            float(row.severity)
+        )
+        for row in alerts.itertuples()
+    ])
+
+
+def run_scan(alerts_db=ALERTS_DB, batch_size=BATCH_SIZE):
+    """
+    Rebuilds the ranked alert table from every shard and returns the
+    number of alerts. Shards are scanned in parallel; this thread is
+    the only writer and inserts their alerts as they arrive.
+    """
+
+    out = sqlite3.connect(alerts_db)
+    init_alerts_db(out)
+    out.execute("DELETE FROM readiness_alerts")
+
+    alerts_queue = queue.Queue(maxsize=ALERT_QUEUE_SIZE)
+    errors = []
+
+    def scan_all():
+        try:
+            map_shards(lambda path: scan_shard(path, alerts_queue, batch_size))
+        except Exception as error:
+            errors.append(error)
+
+    scanner = threading.Thread(target=scan_all, daemon=True)
+    scanner.start()
+
+    remaining = len(SHARD_PATHS)
+    while remaining:
+        alerts = alerts_queue.get()
+        if alerts is None:
+            remaining -= 1
+        else:
+            _insert_alerts(out, alerts)
+    scanner.join()
+
+    if errors:
+        out.close()
+        raise errors[0]
+
+    out.execute("""
+        UPDATE readiness_alerts
+        SET rank = ranked.position
+        FROM (
+            SELECT user_email,
+                   ROW_NUMBER() OVER (ORDER BY severity DESC, user_email) AS position
+            FROM readiness_alerts
+        ) AS ranked
+        WHERE readiness_alerts.user_email = ranked.user_email
+    """)
+    out.commit()
+
+    count = out.execute("SELECT COUNT(*) FROM readiness_alerts").fetchone()[0]
+    out.close()
+    return count
+
+
+if __name__ == "__main__":
+    print("Alerts:", run_scan())
+
+    conn = sqlite3.connect(ALERTS_DB)
+    for row in conn.execute("""
+        SELECT rank, user_email, month, score, score_change, transition, reason
+        FROM readiness_alerts
+        ORDER BY rank
+        LIMIT 20
+    """):
+        print(row)
+    conn.close()
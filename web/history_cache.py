@@ -0,0 +1,228 @@
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+from history_db import get_connection
+
+# Upper bound for all cached series together (estimated bytes)
+HISTORY_CACHE_BYTES = 16 * 1024 * 1024
+
+# Rough fixed cost of one cached user (dict slot, object headers)
+ENTRY_OVERHEAD = 400
+
+
+class StringTable:
+    """
+    Interns repeated strings (levels, profiles, risks) as small-int codes
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.codes = {}
+
+    def code(self, value):
+        if value not in self.codes:
+            self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return self.codes[value]
+
+
+# Only months that survive the period round-trip unchanged
+MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+def _to_period(month):
+    # "YYYY-MM" (what the month input submits) -> months since year 0
+    if not isinstance(month, str) or not MONTH_PATTERN.match(month):
+        raise ValueError(f"Not a YYYY-MM month: {month!r}")
+    year, month_number = month.split("-")
+    return int(year) * 12 + int(month_number) - 1
+
+
+def _to_month(period):
+    return f"{period // 12:04d}-{period % 12 + 1:02d}"
+
+
+class UserHistory:
+    """
+    One user's history as parallel compact arrays, sorted by period
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.periods = array("i")
+        self.scores = array("b")
+        self.levels = array("B")
+        self.profiles = array("H")
+        self.risks = array("H")
+
+    def insert(self, period, score, level, profile, risk):
+        # After any equal periods, like SQLite's ORDER BY month on the index
+        position = bisect_right(self.periods, period)
+        self.periods.insert(position, period)
+        self.scores.insert(position, score)
+        self.levels.insert(position, level)
+        self.profiles.insert(position, profile)
+        self.risks.insert(position, risk)
+
+    def nbytes(self):
+        return ENTRY_OVERHEAD + sum(
+            len(column) * column.itemsize
+            for column in (self.periods, self.scores, self.levels,
+                           self.profiles, self.risks)
+        )
+
+
+class HistoryCache:
+    """
+    LRU cache of compact per-user histories, loaded lazily from the
+    user's shard and written through by /analyze and /clear_history.
+
+    Every entry remembers the history version it matches, so a write
+    made by another worker process is noticed and reloaded.
+    """
+
+    def __init__(self, max_bytes=HISTORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.levels = StringTable()
+        self.profiles = StringTable()
+        self.risks = StringTable()
+
+    # ---------- reads ----------
+    def records(self, user_email, version):
+        """
+        (month, score, level, profile, key_risk) rows ordered by month
+        """
+        entry = self._entry(user_email, version)
+        if entry is None:
+            return self._query(user_email)[1]
+
+        with self.lock:
+            return [
+                (
+                    _to_month(entry.periods[i]),
+                    entry.scores[i],
+                    self.levels.strings[entry.levels[i]],
+                    self.profiles.strings[entry.profiles[i]],
+                    self.risks.strings[entry.risks[i]]
+                )
+                for i in range(len(entry.periods))
+            ]
+
+    def count(self, user_email, version):
+        entry = self._entry(user_email, version)
+        if entry is None:
+            return len(self._query(user_email)[1])
+        return len(entry.periods)
+
+    # ---------- write-through ----------
+    def append(self, user_email, version, month, score, level, profile, risk):
+        """
+        Call after the insert was committed and the version bumped
+        """
+        with self.lock:
+            entry = self.entries.get(user_email)
+            if entry is None:
+                return
+            if entry.version != version - 1:
+                # Missed a write from another process: reload on next read
+                self._discard(user_email)
+                return
+
+            try:
+                period = _to_period(month)
+            except ValueError:
+                self._discard(user_email)
+                return
+
+            self.size -= entry.nbytes()
+            entry.insert(
+                period, score,
+                self.levels.code(level),
+                self.profiles.code(profile),
+                self.risks.code(risk)
+            )
+            entry.version = version
+            self.size += entry.nbytes()
+            self._evict()
+
+    def clear(self, user_email, version):
+        with self.lock:
+            self._discard(user_email)
+            self._store(user_email, UserHistory(version))
+
+    # ---------- internals ----------
+    def _entry(self, user_email, version):
+        with self.lock:
+            entry = self.entries.get(user_email)
+            if entry is not None and entry.version == version:
+                self.entries.move_to_end(user_email)
+                return entry
+
+        # Label the entry with the version its rows were read at: a write
+        # committed since `version` was read is already in the rows
+        current_version, rows = self._query(user_email)
+        entry = UserHistory(current_version)
+        try:
+            with self.lock:
+                for month, score, level, profile, risk in rows:
+                    entry.insert(
+                        _to_period(month), score,
+                        self.levels.code(level),
+                        self.profiles.code(profile),
+                        self.risks.code(risk)
+                    )
+        except (ValueError, TypeError, OverflowError):
+            # Not a "YYYY-MM" month or out-of-range score: serve from SQLite
+            return None
+
+        with self.lock:
+            self._discard(user_email)
+            self._store(user_email, entry)
+        return entry
+
+    def _query(self, user_email):
+        """
+        (version, rows) read in one transaction, so they always match
+        """
+        conn = get_connection(user_email)
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.execute("""
+            SELECT version FROM history_versions
+            WHERE user_email = ?
+        """, (user_email,))
+        row = cursor.fetchone()
+        cursor.execute("""
+            SELECT month, readiness_score, readiness_level,
+                   financial_profile, key_risk
+            FROM readiness_history
+            WHERE user_email = ?
+            ORDER BY month
+        """, (user_email,))
+        rows = cursor.fetchall()
+        conn.commit()
+        conn.close()
+        return (row[0] if row else 0), rows
+
+    def _store(self, user_email, entry):
+        self.entries[user_email] = entry
+        self.size += entry.nbytes()
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            self._discard(next(iter(self.entries)))
+
+    def _discard(self, user_email):
+        entry = self.entries.pop(user_email, None)
+        if entry is not None:
+            self.size -= entry.nbytes()
+
+
+history_cache = HistoryCache()
@@ -1,12 +1,41 @@
+import hashlib
+import os
 import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 DB_NAME = "history.db"
 
-def get_connection():
-    return sqlite3.connect(DB_NAME)
+# Comma-separated list of shard files. Each file can live in its own
+# directory (or mounted volume); a single entry means no sharding.
+SHARD_PATHS = os.environ.get("HISTORY_SHARDS", DB_NAME).split(",")
 
-def init_history_db():
-    conn = get_connection()
+def shard_for(user_email, shard_paths=None):
+    """
+    Stable shard index for a user (same on every process and restart)
+    """
+    shard_paths = shard_paths or SHARD_PATHS
+    digest = hashlib.sha1(user_email.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % len(shard_paths)
+
+def connect_shard(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return sqlite3.connect(path)
+
+def get_connection(user_email=None):
+    """
+    Connection to the shard holding this user's history
+    """
+    if user_email is None:
+        if len(SHARD_PATHS) > 1:
+            raise ValueError("user_email is required when history is sharded")
+        return connect_shard(SHARD_PATHS[0])
+    return connect_shard(SHARD_PATHS[shard_for(user_email)])
+
+def _init_shard(path):
+    conn = connect_shard(path)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -22,8 +51,172 @@ def init_history_db():
         )
     """)
 
+    # Every page query filters by user and orders by month
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_user_month
+        ON readiness_history (user_email, month)
+    """)
+
+    # Aggregates of old assessments (see history_maintenance.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS readiness_rollups (
+            user_email TEXT NOT NULL,
+            period TEXT NOT NULL,
+            assessments INTEGER NOT NULL,
+            score_sum INTEGER NOT NULL,
+            min_score INTEGER NOT NULL,
+            max_score INTEGER NOT NULL,
+            PRIMARY KEY (user_email, period)
+        )
+    """)
+
+    # One counter per user, bumped whenever their history changes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history_versions (
+            user_email TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
     conn.commit()
     conn.close()
 
+def init_history_db():
+    for path in SHARD_PATHS:
+        _init_shard(path)
+
+def map_shards(job, shard_paths=None):
+    """
+    Runs job(shard_path) on every shard in parallel (one thread per
+    shard; SQLite releases the GIL while it works) and returns the
+    results in shard order
+    """
+    shard_paths = shard_paths or SHARD_PATHS
+    if len(shard_paths) == 1:
+        return [job(shard_paths[0])]
+
+    with ThreadPoolExecutor(max_workers=len(shard_paths)) as pool:
+        return list(pool.map(job, shard_paths))
+
+def get_history_version(user_email):
+    conn = get_connection(user_email)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT version FROM history_versions
+        WHERE user_email = ?
+    """, (user_email,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def bump_history_version(cursor, user_email):
+    """
+    Must run inside the same transaction as the history write.
+    Returns the new version.
+    """
+    cursor.execute("""
+        INSERT INTO history_versions (user_email, version)
+        VALUES (?, 1)
+        ON CONFLICT(user_email) DO UPDATE SET version = version + 1
+    """, (user_email,))
+    cursor.execute("""
+        SELECT version FROM history_versions
+        WHERE user_email = ?
+    """, (user_email,))
+    return cursor.fetchone()[0]
+
+def rebalance(old_paths, new_paths=None):
+    """
+    Moves every user whose shard changed from the old layout
+    to the new one (default: the configured SHARD_PATHS).
+
+    Each user is moved in one transaction spanning both files,
+    so an interrupted run can simply be started again.
+    Run it while the app is stopped.
+    """
+    new_paths = new_paths or SHARD_PATHS
+    for path in new_paths:
+        _init_shard(path)
+
+    moved = 0
+    for old_path in old_paths:
+        if not os.path.exists(old_path):
+            continue
+
+        conn = connect_shard(old_path)
+        users = [row[0] for row in conn.execute("""
+            SELECT user_email FROM readiness_history
+            WHERE user_email IS NOT NULL
+            UNION
+            SELECT user_email FROM history_versions
+            UNION
+            SELECT user_email FROM readiness_rollups
+        """)]
+        conn.close()
+
+        for user_email in users:
+            new_path = new_paths[shard_for(user_email, new_paths)]
+            if os.path.abspath(new_path) == os.path.abspath(old_path):
+                continue
+            _move_user(user_email, old_path, new_path)
+            moved += 1
+
+    return moved
+
+def _move_user(user_email, old_path, new_path):
+    conn = connect_shard(new_path)
+    conn.execute("ATTACH DATABASE ? AS source", (old_path,))
+    with conn:
+        conn.execute("""
+            INSERT INTO readiness_history (
+                user_email, month, readiness_score, readiness_level,
+                financial_profile, key_risk, created_at
+            )
+            SELECT user_email, month, readiness_score, readiness_level,
+                   financial_profile, key_risk, created_at
+            FROM source.readiness_history
+            WHERE user_email = ?
+            ORDER BY id
+        """, (user_email,))
+        conn.execute("""
+            INSERT INTO readiness_rollups (
+                user_email, period, assessments, score_sum, min_score, max_score
+            )
+            SELECT user_email, period, assessments, score_sum, min_score, max_score
+            FROM source.readiness_rollups
+            WHERE user_email = ?
+            ON CONFLICT(user_email, period) DO UPDATE SET
+                assessments = assessments + excluded.assessments,
+                score_sum = score_sum + excluded.score_sum,
+                min_score = MIN(min_score, excluded.min_score),
+                max_score = MAX(max_score, excluded.max_score)
+        """, (user_email,))
+        conn.execute("""
+            INSERT INTO history_versions (user_email, version)
+            SELECT user_email, version FROM source.history_versions
+            WHERE user_email = ?
+            ON CONFLICT(user_email) DO UPDATE
+            SET version = MAX(version, excluded.version)
+        """, (user_email,))
+        conn.execute(
+            "DELETE FROM source.readiness_history WHERE user_email = ?",
+            (user_email,)
+        )
+        conn.execute(
+            "DELETE FROM source.readiness_rollups WHERE user_email = ?",
+            (user_email,)
+        )
+        conn.execute(
+            "DELETE FROM source.history_versions WHERE user_email = ?",
+            (user_email,)
+        )
+    conn.execute("DETACH DATABASE source")
+    conn.close()
+
 if __name__ == "__main__":
-    init_history_db()
+    # python history_db.py                      -> create tables on every shard
+    # python history_db.py rebalance OLD_SHARDS -> move users to HISTORY_SHARDS
+    if len(sys.argv) == 3 and sys.argv[1] == "rebalance":
+        print("Users moved:", rebalance(sys.argv[2].split(",")))
+    else:
+        init_history_db()
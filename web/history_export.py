@@ -0,0 +1,257 @@
+"""
+Streaming CSV / NDJSON exports of readiness history and scored portfolios.
+
+    python history_export.py history --format ndjson > all.ndjson
+    python history_export.py history --user a@b.com --from 2025-01 --to 2025-12
+    python history_export.py history --cursor <token from the last row>
+    python history_export.py portfolio ../data/portfolio.csv --format csv
+
+Rows are read page by page with keyset pagination, so memory stays
+constant and no read transaction is held open for the whole export.
+Every row carries a cursor token; passing the last one back resumes
+the export right after that row.
+"""
+
+import argparse
+import base64
+import csv
+import io
+import json
+import math
+import os
+import sys
+
+from history_db import SHARD_PATHS, connect_shard, shard_for
+
+PAGE_SIZE = 5000
+
+HISTORY_COLUMNS = [
+    "user_email", "month", "readiness_score", "readiness_level",
+    "financial_profile", "key_risk", "created_at"
+]
+
+PORTFOLIO_COLUMNS = [
+    "month", "income", "fixed_expenses", "variable_expenses",
+    "intended_savings", "actual_savings", "emergency_fund",
+    "savings_rate", "expense_ratio", "savings_gap", "readiness_score", "readiness_level", "financial_profile",
+    "resistance_reason", "insights"
+]
+
+MIMETYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+
+# ===============================
+# Cursor tokens
+# ===============================
+def encode_cursor(position):
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+# Every key a cursor may hold, with its type
+CURSOR_FIELDS = {"month": str, "id": int, "shard": int, "row": int}
+
+
+def decode_cursor(token):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid export cursor.")
+
+    if not isinstance(position, dict):
+        raise ValueError("Invalid export cursor.")
+    for key, value in position.items():
+        expected = CURSOR_FIELDS.get(key)
+        # bool is an int subclass; counters are never negative
+        if (expected is None or not isinstance(value, expected)
+                or isinstance(value, bool)
+                or (expected is int and value < 0)):
+            raise ValueError("Invalid export cursor.")
+    return position
+
+
+# ===============================
+# History pages
+# ===============================
+def _user_pages(user_email, start, end, position, page_size):
+    # One user: ordered by (month, id) on the (user_email, month) index
+    path = SHARD_PATHS[shard_for(user_email)]
+    month, last_id = position.get("month", ""), position.get("id", 0)
+
+    while True:
+        conn = connect_shard(path)
+        rows = conn.execute(f"""
+            SELECT id, {", ".join(HISTORY_COLUMNS)}
+            FROM readiness_history
+            WHERE user_email = ?
+              AND month >= ? AND month <= ?
+              AND (month, id) > (?, ?)
+            ORDER BY month, id
+            LIMIT ?
+        """, (user_email, start, end, month, last_id, page_size)).fetchall()
+        conn.close()
+
+        if not rows:
+            return
+        for row in rows:
+            month, last_id = row[2], row[0]
+            yield row[1:], {"month": month, "id": last_id}
+
+
+def _portfolio_pages(start, end, position, page_size):
+    # Every user: shard by shard, ordered by id
+    for shard in range(position.get("shard", 0), len(SHARD_PATHS)):
+        last_id = position.get("id", 0) if shard == position.get("shard", 0) else 0
+
+        while True:
+            conn = connect_shard(SHARD_PATHS[shard])
+            rows = conn.execute(f"""
+                SELECT id, {", ".join(HISTORY_COLUMNS)}
+                FROM readiness_history
+                WHERE id > ? AND month >= ? AND month <= ?
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, start, end, page_size)).fetchall()
+            conn.close()
+
+            if not rows:
+                break
+            for row in rows:
+                last_id = row[0]
+                yield row[1:], {"shard": shard, "id": last_id}
+
+
+def iter_history(user_email=None, start=None, end=None, cursor=None,
+                 page_size=PAGE_SIZE):
+    """
+    Yields (row, cursor_token) for one user's history, or for every
+    user when user_email is None. start / end are inclusive "YYYY-MM".
+    """
+    position = decode_cursor(cursor) if cursor else {}
+    start = start or ""
+    end = end or "9999-12"
+
+    if user_email is None:
+        pages = _portfolio_pages(start, end, position, page_size)
+    else:
+        pages = _user_pages(user_email, start, end, position, page_size)
+
+    for row, position in pages:
+        yield dict(zip(HISTORY_COLUMNS, row)), encode_cursor(position)
+
+
+# ===============================
+# Scored portfolio
+# ===============================
+def iter_portfolio(file_path, chunk_size=PAGE_SIZE, cursor=None):
+    """
+    Yields (row, cursor_token) for a portfolio CSV, scored chunk by chunk
+    """
+    import pandas as pd
+
+    sys.path.append(
+        os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "core"))
+    )
+    from scoring_engine import calculate_metrics
+    from outcome_table import apply_outcomes
+
+    skip = decode_cursor(cursor).get("row", -1) + 1 if cursor else 0
+    columns = [c for c in PORTFOLIO_COLUMNS if c != "insights"]
+
+    reader = pd.read_csv(
+        file_path,
+        chunksize=chunk_size,
+        skiprows=range(1, skip + 1)
+    )
+    number = skip - 1
+    for chunk in reader:
+        # Input columns of our own (client_id, ...) are kept in front
+        extra = [c for c in chunk.columns if c not in PORTFOLIO_COLUMNS]
+        scored = apply_outcomes(calculate_metrics(chunk))
+        for record, insights in zip(
+            scored[extra + columns].to_dict("records"), scored["insights"]
+        ):
+            number += 1
+            record["insights"] = list(insights)
+            yield record, encode_cursor({"row": number})
+
+
+# ===============================
+# Serializers
+# ===============================
+def _plain(value):
+    # NumPy scalars -> Python values for json / csv; NaN / inf -> None,
+    # which strict JSON parsers accept (and csv writes as empty)
+    value = value.item() if hasattr(value, "item") else value
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def stream_ndjson(rows):
+    for row, token in rows:
+        record = {key: _plain(value) for key, value in row.items()}
+        record["cursor"] = token
+        yield json.dumps(record, allow_nan=False) + "\n"
+
+
+def stream_csv(rows, page_size=PAGE_SIZE):
+    """
+    Yields the CSV in chunks of `page_size` rows
+    (header first, cursor token as the last column)
+    """
+    buffer = io.StringIO()
+    writer = None
+    count = 0
+
+    for row, token in rows:
+        if writer is None:
+            writer = csv.writer(buffer)
+            writer.writerow(list(row) + ["cursor"])
+        values = [
+            "; ".join(value) if isinstance(value, list) else _plain(value)
+            for value in row.values()
+        ]
+        writer.writerow(values + [token])
+        count += 1
+
+        if count % page_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_rows(rows, export_format):
+    if export_format == "csv":
+        return stream_csv(rows)
+    if export_format == "ndjson":
+        return stream_ndjson(rows)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming history export")
+    parser.add_argument("source", choices=["history", "portfolio"])
+    parser.add_argument("file", nargs="?", help="portfolio CSV to score")
+    parser.add_argument("--format", choices=list(MIMETYPES), default="csv")
+    parser.add_argument("--user")
+    parser.add_argument("--from", dest="start")
+    parser.add_argument("--to", dest="end")
+    parser.add_argument("--cursor")
+    args = parser.parse_args()
+
+    if args.source == "history":
+        rows = iter_history(args.user, args.start, args.end, args.cursor)
+    elif args.file:
+        rows = iter_portfolio(args.file, cursor=args.cursor)
+    else:
+        parser.error("portfolio export needs a CSV file")
+
+    for chunk in stream_rows(rows, args.format):
+        sys.stdout.write(chunk)
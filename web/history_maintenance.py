@@ -0,0 +1,262 @@
+"""
+Maintenance jobs for readiness_history, meant to run from cron:
+
+    python history_maintenance.py            # one pass over every shard
+    python history_maintenance.py 86400      # keep running once a day
+"""
+
+import csv
+import gzip
+import hashlib
+import itertools
+import os
+import sys
+import time
+from datetime import date, datetime
+
+from history_db import (
+    connect_shard,
+    init_history_db,
+    map_shards,
+    bump_history_version
+)
+
+# Raw assessments older than this are rolled into quarterly aggregates
+QUARTERLY_AFTER_MONTHS = 24
+
+# Quarterly aggregates older than this are merged into yearly ones
+YEARLY_AFTER_MONTHS = 60
+
+ARCHIVE_DIR = "archive"
+
+# Pages released per incremental vacuum run
+VACUUM_PAGES = 1000
+
+MONTH_PATTERN = "[0-9][0-9][0-9][0-9]-[0-9][0-9]"
+
+
+def _quarter_start(months_back, today=None):
+    """
+    'YYYY-MM' of the first month of the quarter `months_back` months ago
+    """
+    today = today or date.today()
+    total = today.year * 12 + today.month - 1 - months_back
+    year, month = divmod(total, 12)
+    return f"{year:04d}-{month - month % 3 + 1:02d}"
+
+
+def _touched_users(cursor, where, params):
+    cursor.execute(
+        f"SELECT DISTINCT user_email FROM readiness_history WHERE {where}",
+        params
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _bump_versions(cursor, users):
+    for user_email in users:
+        bump_history_version(cursor, user_email)
+
+
+# ===============================
+# 1️⃣ Deduplication
+# ===============================
+def deduplicate(conn):
+    """
+    Keeps only the latest submission for each (user, month)
+    """
+    cursor = conn.cursor()
+    where = """
+        id NOT IN (
+            SELECT MAX(id) FROM readiness_history
+            GROUP BY user_email, month
+        )
+    """
+    users = _touched_users(cursor, where, ())
+    cursor.execute(f"DELETE FROM readiness_history WHERE {where}")
+    removed = cursor.rowcount
+    _bump_versions(cursor, users)
+    conn.commit()
+    return removed
+
+
+# ===============================
+# 2️⃣ Archive + quarterly rollup
+# ===============================
+def _create_archive(shard_path):
+    """
+    Opens a new archive file that is unique per shard and never
+    overwrites an existing one (shards often share a basename, e.g.
+    /vol_a/history.db and /vol_b/history.db)
+    """
+    shard_name = os.path.splitext(os.path.basename(shard_path))[0]
+    shard_hash = hashlib.sha1(
+        os.path.abspath(shard_path).encode("utf-8")
+    ).hexdigest()[:8]
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    for attempt in itertools.count():
+        suffix = f"_{attempt}" if attempt else ""
+        path = os.path.join(
+            ARCHIVE_DIR, f"{shard_name}_{shard_hash}_{stamp}{suffix}.csv.gz"
+        )
+        try:
+            return gzip.open(path, "xt", newline="", encoding="utf-8")
+        except FileExistsError:
+            continue
+
+
+def _archive_rows(cursor, where, params, shard_path):
+    cursor.execute(f"""
+        SELECT id, user_email, month, readiness_score, readiness_level,
+               financial_profile, key_risk, created_at
+        FROM readiness_history
+        WHERE {where}
+        ORDER BY user_email, month
+    """, params)
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    file = _create_archive(shard_path)
+    path = file.name
+
+    count = 0
+    with file:
+        writer = csv.writer(file)
+        writer.writerow([column[0] for column in cursor.description])
+        for row in cursor:
+            writer.writerow(row)
+            count += 1
+
+    if count == 0:
+        os.remove(path)
+        return None
+    return path
+
+
+def rollup_quarters(conn, shard_path, months=QUARTERLY_AFTER_MONTHS):
+    """
+    Archives raw rows older than `months` to a gzip CSV and replaces
+    them with per-quarter aggregates
+    """
+    cutoff = _quarter_start(months)
+    where = "month GLOB ? AND month < ?"
+    params = (MONTH_PATTERN, cutoff)
+
+    cursor = conn.cursor()
+    # Hold the write lock from the archive read to the delete, so a row
+    # committed in between can't be rolled up without being archived
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        archive_path = _archive_rows(cursor, where, params, shard_path)
+    except BaseException:
+        conn.rollback()
+        raise
+    if archive_path is None:
+        conn.rollback()
+        return 0
+
+    users = _touched_users(cursor, where, params)
+    cursor.execute(f"""
+        INSERT INTO readiness_rollups (
+            user_email, period, assessments, score_sum, min_score, max_score
+        )
+        SELECT user_email,
+               substr(month, 1, 4) || '-Q' ||
+               ((CAST(substr(month, 6, 2) AS INTEGER) + 2) / 3),
+               COUNT(*), SUM(readiness_score),
+               MIN(readiness_score), MAX(readiness_score)
+        FROM readiness_history
+        WHERE {where}
+        GROUP BY 1, 2
+        ON CONFLICT(user_email, period) DO UPDATE SET
+            assessments = assessments + excluded.assessments,
+            score_sum = score_sum + excluded.score_sum,
+            min_score = MIN(min_score, excluded.min_score),
+            max_score = MAX(max_score, excluded.max_score)
+    """, params)
+    cursor.execute(f"DELETE FROM readiness_history WHERE {where}", params)
+    rolled = cursor.rowcount
+    _bump_versions(cursor, users)
+    conn.commit()
+    return rolled
+
+
+# ===============================
+# 3️⃣ Yearly rollup
+# ===============================
+def rollup_years(conn, months=YEARLY_AFTER_MONTHS):
+    """
+    Merges quarterly aggregates of years that ended more than
+    `months` ago into one aggregate per year
+    """
+    cutoff_year = _quarter_start(months)[:4]
+    where = "period GLOB '[0-9][0-9][0-9][0-9]-Q[1-4]' AND period < ?"
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        INSERT INTO readiness_rollups (
+            user_email, period, assessments, score_sum, min_score, max_score
+        )
+        SELECT user_email, substr(period, 1, 4),
+               SUM(assessments), SUM(score_sum),
+               MIN(min_score), MAX(max_score)
+        FROM readiness_rollups
+        WHERE {where}
+        GROUP BY 1, 2
+        ON CONFLICT(user_email, period) DO UPDATE SET
+            assessments = assessments + excluded.assessments,
+            score_sum = score_sum + excluded.score_sum,
+            min_score = MIN(min_score, excluded.min_score),
+            max_score = MAX(max_score, excluded.max_score)
+    """, (cutoff_year,))
+    cursor.execute(f"DELETE FROM readiness_rollups WHERE {where}", (cutoff_year,))
+    merged = cursor.rowcount
+    conn.commit()
+    return merged
+
+
+# ===============================
+# 4️⃣ Incremental vacuum
+# ===============================
+def incremental_vacuum(conn, pages=VACUUM_PAGES):
+    """
+    Returns free pages to the filesystem a few at a time.
+    The first run switches the file to incremental auto-vacuum,
+    which needs one full VACUUM.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+
+
+def maintain_shard(path):
+    conn = connect_shard(path)
+    result = {
+        "shard": path,
+        "duplicates_removed": deduplicate(conn),
+        "rows_rolled_up": rollup_quarters(conn, path),
+        "quarters_merged": rollup_years(conn)
+    }
+    incremental_vacuum(conn)
+    conn.close()
+    return result
+
+
+def run_maintenance():
+    """
+    Runs every job on every shard, shards in parallel
+    """
+    init_history_db()
+    return map_shards(maintain_shard)
+
+
+if __name__ == "__main__":
+    interval = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    while True:
+        for result in run_maintenance():
+            print(result)
+        if interval is None:
+            break
+        time.sleep(interval)
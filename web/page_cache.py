@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response
+
+# Upper bound for all cached fragments together (characters of HTML)
+FRAGMENT_CACHE_SIZE = 4 * 1024 * 1024
+
+# Cached pages and fragments are re-rendered at least this often.
+# Rendering touches the charts a page links, so this must stay well
+# below static_assets.PLOT_RETENTION_DAYS.
+FRAGMENT_MAX_AGE = 24 * 3600
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+
+def _template_fingerprint():
+    # Part of every ETag, so a deploy with new templates invalidates
+    # what browsers have cached
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(TEMPLATE_DIR)):
+        with open(os.path.join(TEMPLATE_DIR, name), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:12]
+
+
+TEMPLATE_FINGERPRINT = _template_fingerprint()
+
+
+def page_etag(page, user_email, version):
+    # Rolls over every FRAGMENT_MAX_AGE, so browsers revalidating an old
+    # page get a fresh render instead of 304 forever
+    epoch = int(time.time() // FRAGMENT_MAX_AGE)
+    key = f"{page}:{user_email}:{version}:{TEMPLATE_FINGERPRINT}:{epoch}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def set_page_etag(response, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered HTML fragments, one entry per (fragment, user).
+
+    Entries remember the history version they were rendered for, so a
+    bumped version is simply a miss and the stale entry gets replaced.
+    Entries older than `max_age` seconds are misses too.
+    """
+
+    def __init__(self, max_size=FRAGMENT_CACHE_SIZE, max_age=FRAGMENT_MAX_AGE):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, name, user_email, version):
+        key = (name, user_email)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            if time.monotonic() - entry[2] > self.max_age:
+                self._discard(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, name, user_email, version, html):
+        key = (name, user_email)
+        with self.lock:
+            self._discard(key)
+            if len(html) > self.max_size:
+                return
+            self.entries[key] = (version, html, time.monotonic())
+            self.size += len(html)
+            while self.size > self.max_size:
+                self._discard(next(iter(self.entries)))
+
+    def invalidate(self, user_email):
+        with self.lock:
+            for key in [k for k in self.entries if k[1] == user_email]:
+                self._discard(key)
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,242 @@
+"""
+PDF layouts shared by the download endpoints and the bulk generator.
+
+    python pdf_reports.py history reports.zip
+    python pdf_reports.py csv ../data/portfolio.csv reports.zip
+"""
+
+import hashlib
+import itertools
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from io import BytesIO
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+
+# Built once per process (every pool worker imports this module once)
+STYLES = getSampleStyleSheet()
+
+HISTORY_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
+    ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
+    ("FONT", (0,0), (-1,0), "Helvetica-Bold"),
+    ("VALIGN", (0,0), (-1,-1), "TOP"),
+    ("LEFTPADDING", (0,0), (-1,-1), 6),
+    ("RIGHTPADDING", (0,0), (-1,-1), 6),
+])
+
+HISTORY_COLUMN_WIDTHS = [70, 60, 60, 160, 180]
+
+# Users read per query by history_jobs (each page is one short read)
+HISTORY_USERS_PER_PAGE = 200
+
+
+def _build_pdf(elements):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+
+def build_evaluation_pdf(user, report_text):
+    elements = []
+
+    # Title
+    elements.append(Paragraph(
+        "<b>Financial Readiness Evaluation Report</b>",
+        STYLES["Title"]
+    ))
+    elements.append(Spacer(1, 12))
+
+    # User
+    elements.append(Paragraph(
+        f"<b>User:</b> {user}",
+        STYLES["Normal"]
+    ))
+    elements.append(Spacer(1, 12))
+
+    # Body (split text into paragraphs)
+    for line in report_text.split("\n"):
+        elements.append(Paragraph(line, STYLES["Normal"]))
+        elements.append(Spacer(1, 8))
+
+    return _build_pdf(elements)
+
+
+def build_history_pdf(user, records):
+    """
+    records: (month, score, level, profile, key_risk) rows
+    """
+    elements = []
+
+    elements.append(Paragraph(
+        "<b>Financial Readiness History Report</b>",
+        STYLES["Title"]
+    ))
+    elements.append(Spacer(1, 12))
+    elements.append(Paragraph(
+        f"User: {user}",
+        STYLES["Normal"]
+    ))
+    elements.append(Spacer(1, 16))
+
+    normal = STYLES["Normal"]
+    table_data = [
+        ["Month", "Score", "Level", "Profile", "Key Risk"]
+    ]
+
+    for r in records:
+        table_data.append([
+            r[0],  # Month
+            f"{r[1]}/100",
+            r[2],
+            Paragraph(r[3], normal),  # ✅ wrapped Profile
+            Paragraph(r[4], normal)   # ✅ wrapped Key Risk
+        ])
+
+    table = Table(table_data, colWidths=HISTORY_COLUMN_WIDTHS)
+    table.setStyle(HISTORY_TABLE_STYLE)
+
+    elements.append(table)
+    return _build_pdf(elements)
+
+
+# ===============================
+# Bulk generation
+# ===============================
+def _render_job(job):
+    kind, user, payload = job
+    if kind == "history":
+        buffer = build_history_pdf(user, payload)
+    else:
+        buffer = build_evaluation_pdf(user, payload)
+    return user, buffer.getvalue()
+
+
+def _archive_name(user, used):
+    """
+    ZIP entry name for a user, unique within `used`. Names that had to
+    be sanitized get a hash of the original, so "a b@x" and "a_b@x"
+    don't end up in the same entry.
+    """
+    user = str(user)
+    stem = re.sub(r"[^\w.@-]", "_", user)
+    if stem != user:
+        stem += "-" + hashlib.sha1(user.encode("utf-8")).hexdigest()[:8]
+
+    name = stem + ".pdf"
+    for attempt in itertools.count(2):
+        if name not in used:
+            break
+        name = f"{stem}-{attempt}.pdf"
+    used.add(name)
+    return name
+
+
+def write_reports_zip(jobs, output, workers=None, max_pending=None):
+    """
+    Builds the PDF of every job in worker processes and streams each
+    one into a ZIP archive as soon as it is finished.
+
+    jobs: iterable of ("history", user, records) or
+          ("evaluation", user, report_text), consumed lazily.
+    At most `max_pending` reports are in flight at any time,
+    so memory stays bounded however many jobs there are.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    jobs = iter(jobs)
+    written = 0
+    names = set()
+
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {
+            pool.submit(_render_job, job)
+            for job in itertools.islice(jobs, max_pending)
+        }
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                user, pdf = future.result()
+                archive.writestr(_archive_name(user, names), pdf)
+                written += 1
+
+            for job in itertools.islice(jobs, len(done)):
+                pending.add(pool.submit(_render_job, job))
+
+    return written
+
+
+def history_jobs(users_per_page=HISTORY_USERS_PER_PAGE):
+    """
+    One history report job per user, streamed shard by shard.
+
+    Users are read in keyset pages and the connection is closed before
+    any job is yielded, so a slow ZIP build never holds a read lock
+    that would block the app's writes.
+    """
+    from history_db import SHARD_PATHS, connect_shard
+
+    for path in SHARD_PATHS:
+        last_user = None
+        while True:
+            conn = connect_shard(path)
+            rows = conn.execute("""
+                SELECT user_email, month, readiness_score, readiness_level,
+                       financial_profile, key_risk
+                FROM readiness_history
+                WHERE user_email IN (
+                    SELECT DISTINCT user_email FROM readiness_history
+                    WHERE user_email IS NOT NULL
+                      AND (? IS NULL OR user_email > ?)
+                    ORDER BY user_email
+                    LIMIT ?
+                )
+                ORDER BY user_email, month
+            """, (last_user, last_user, users_per_page)).fetchall()
+            conn.close()
+
+            if not rows:
+                break
+            for user, group in itertools.groupby(rows, key=lambda row: row[0]):
+                yield "history", user, [row[1:] for row in group]
+            last_user = rows[-1][0]
+
+
+def portfolio_jobs(file_path, client_column="client_id"):
+    """
+    One evaluation report job per client of a portfolio CSV
+    (based on the client's latest month)
+    """
+    sys.path.append(
+        os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "core"))
+    )
+    from scoring_engine import load_data, calculate_metrics
+    from outcome_table import apply_outcomes
+
+    df = apply_outcomes(calculate_metrics(load_data(file_path)))
+    if client_column not in df:
+        df[client_column] = "client"
+
+    latest = df.groupby(client_column, sort=False).tail(1)
+    for client, report_text in zip(latest[client_column], latest["user_report"]):
+        yield "evaluation", client, report_text
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "history":
+        count = write_reports_zip(history_jobs(), sys.argv[2])
+    elif len(sys.argv) == 4 and sys.argv[1] == "csv":
+        count = write_reports_zip(portfolio_jobs(sys.argv[2]), sys.argv[3])
+    else:
+        sys.exit(__doc__)
+    print("Reports written:", count)
@@ -0,0 +1,264 @@
+"""
+Fingerprinted, precompressed static files with long-lived caching.
+
+    python static_assets.py        # precompress static/, prune old charts
+
+url_for("static", filename="style.css") yields style.<hash>.css, and
+that URL is served with an immutable one-year Cache-Control. Generated
+charts are already named after their content (see save_fingerprinted),
+so they are linked as they are. Text assets get .gz (and .br when the
+brotli package is installed) variants next to them, built on first use
+and served to clients that accept them.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from flask import request, send_file, abort
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Keep in sync with PLOT_DIGEST_LENGTH in core/visualizations.py
+DIGEST_LENGTH = 12
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# Only formats that are not already compressed (PNGs are)
+COMPRESSIBLE_TYPES = {".css", ".js", ".svg", ".html", ".txt", ".json"}
+
+# A variant must save at least this fraction of the size to be kept
+MIN_SAVING = 0.1
+
+# Generated charts no page has rendered for this long are pruned
+# (cached pages are re-rendered within page_cache.FRAGMENT_MAX_AGE)
+PLOT_RETENTION_DAYS = 7
+
+FINGERPRINTED = re.compile(
+    rf"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{{{DIGEST_LENGTH}}})(?P<ext>\.\w+)$"
+)
+
+
+def _compress_gzip(data):
+    # mtime=0 keeps the output identical between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+# Preferred first
+ENCODINGS = [("br", ".br", _compress_brotli), ("gzip", ".gz", _compress_gzip)]
+if brotli is None:
+    ENCODINGS = ENCODINGS[1:]
+
+
+class StaticAssets:
+    """
+    Content digests and compressed variants of the files in one static
+    folder, cached per (mtime, size) so edited files are noticed
+    """
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.digests = {}
+        self.variants = {}
+        self.lock = threading.Lock()
+
+    # ---------- fingerprints ----------
+    def digest(self, filename):
+        path = safe_join(self.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.digests.get(filename)
+            if cached and cached[0] == key:
+                return cached[1]
+
+        with open(path, "rb") as file:
+            digest = hashlib.sha1(file.read()).hexdigest()[:DIGEST_LENGTH]
+        with self.lock:
+            self.digests[filename] = (key, digest)
+        return digest
+
+    def fingerprint(self, filename):
+        """
+        style.css -> style.<hash>.css (unchanged for content-named
+        charts and missing files)
+        """
+        if FINGERPRINTED.match(filename):
+            return filename
+
+        digest = self.digest(filename)
+        if digest is None:
+            return filename
+        stem, ext = os.path.splitext(filename)
+        return f"{stem}.{digest}{ext}"
+
+    def resolve(self, filename):
+        """
+        Requested name -> (file on disk, whether the URL is immutable)
+        """
+        path = safe_join(self.static_folder, filename)
+        if path is None:
+            return None, False
+        if os.path.isfile(path):
+            # Content-named charts never change; plain names may
+            return filename, FINGERPRINTED.match(filename) is not None
+
+        match = FINGERPRINTED.match(filename)
+        if match is None:
+            return None, False
+        source = match["stem"] + match["ext"]
+        current = self.digest(source)
+        if current is None:
+            return None, False
+        # An outdated fingerprint still gets the current file, uncached
+        return source, current == match["digest"]
+
+    # ---------- compressed variants ----------
+    def variant(self, filename, accepted):
+        """
+        Path and encoding of the best precompressed variant the client
+        accepts, or (None, None)
+        """
+        if os.path.splitext(filename)[1] not in COMPRESSIBLE_TYPES:
+            return None, None
+
+        path = safe_join(self.static_folder, filename)
+        for encoding, suffix, compress in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            if self._build(path, suffix, compress):
+                return path + suffix, encoding
+        return None, None
+
+    def _build(self, path, suffix, compress):
+        # True when an up-to-date variant exists (building it if needed)
+        stat = os.stat(path)
+        key = (path, suffix)
+        with self.lock:
+            cached = self.variants.get(key)
+        if cached and cached[0] == stat.st_mtime_ns:
+            return cached[1]
+
+        variant_path = path + suffix
+        if (os.path.isfile(variant_path)
+                and os.stat(variant_path).st_mtime_ns >= stat.st_mtime_ns):
+            useful = True
+        else:
+            with open(path, "rb") as file:
+                data = file.read()
+            compressed = compress(data)
+            useful = len(compressed) <= len(data) * (1 - MIN_SAVING)
+            if useful:
+                useful = self._write_variant(variant_path, compressed)
+
+        with self.lock:
+            self.variants[key] = (stat.st_mtime_ns, useful)
+        return useful
+
+    def _write_variant(self, variant_path, compressed):
+        # A read-only static folder or a full disk only costs compression:
+        # the request falls back to the uncompressed file
+        temp_path = f"{variant_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(compressed)
+            os.replace(temp_path, variant_path)
+            return True
+        except OSError:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            return False
+
+    # ---------- serving ----------
+    def send(self, filename):
+        source, immutable = self.resolve(filename)
+        if source is None:
+            abort(404)
+
+        mimetype = mimetypes.guess_type(source)[0] or "application/octet-stream"
+        variant_path, encoding = self.variant(source, request.accept_encodings)
+
+        if variant_path is None:
+            response = send_file(
+                safe_join(self.static_folder, source), mimetype=mimetype
+            )
+        else:
+            response = send_file(variant_path, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+
+        if os.path.splitext(source)[1] in COMPRESSIBLE_TYPES:
+            response.vary.add("Accept-Encoding")
+        if immutable:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE
+        return response
+
+    # ---------- maintenance ----------
+    def build_all(self):
+        """
+        Precompresses every compressible file, returns the variant count
+        """
+        count = 0
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                if os.path.splitext(name)[1] not in COMPRESSIBLE_TYPES:
+                    continue
+                path = os.path.join(root, name)
+                for _, suffix, compress in ENCODINGS:
+                    count += self._build(path, suffix, compress)
+        return count
+
+    def prune_plots(self, days=PLOT_RETENTION_DAYS):
+        """
+        Deletes generated charts older than `days`, returns the count
+        """
+        plots_dir = os.path.join(self.static_folder, "plots")
+        if not os.path.isdir(plots_dir):
+            return 0
+
+        cutoff = time.time() - days * 86400
+        count = 0
+        for name in os.listdir(plots_dir):
+            path = os.path.join(plots_dir, name)
+            if FINGERPRINTED.match(name) and os.stat(path).st_mtime < cutoff:
+                os.remove(path)
+                count += 1
+        return count
+
+
+def init_static_assets(app):
+    """
+    Replaces Flask's static view and fingerprints url_for("static", ...)
+    """
+    assets = StaticAssets(app.static_folder)
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = assets.fingerprint(values["filename"])
+
+    app.view_functions["static"] = assets.send
+    return assets
+
+
+if __name__ == "__main__":
+    assets = StaticAssets("static")
+    print("Compressed variants:", assets.build_all())
+    print("Pruned charts:", assets.prune_plots())